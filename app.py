@@ -1,13 +1,12 @@
 import os
-import sqlite3
+from collections import Counter
 from io import BytesIO
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+import plotly.graph_objects as go
+from xml.sax.saxutils import escape
 
 # -------------------- Page Setup --------------------
 st.set_page_config(page_title="TravelPulse Sri Lanka", layout="wide")
@@ -17,16 +16,74 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ASSETS_DIR = os.path.join(BASE_DIR, "Assets")
 
 reviews_xlsx = os.path.join(BASE_DIR, "Final_Cleaned_Tourist_Reviews.xlsx")
+reviews_parquet = os.path.join(BASE_DIR, "Final_Cleaned_Tourist_Reviews.parquet")
 activities_csv = os.path.join(BASE_DIR, "Rural_Activities_Expanded.csv")
 
 ITINERARY_MAP = os.path.join(ASSETS_DIR, "sri-lankan-travel-map.jpg")
 ABOUT_SIDE_IMG = os.path.join(ASSETS_DIR, "jaffna-aesthetic.jpeg")
 
 # -------------------- Load Excel Data --------------------
-@st.cache_data
+URBAN_DISTRICTS = frozenset(["Colombo", "Kandy", "Galle", "Jaffna", "Negombo", "Matara", "Kurunegala"])
+REVIEW_COLUMNS = ['Cleaned_Review', 'Sentiment', 'District', 'Destination', 'Latitude', 'Longitude']
+
+def normalize_labels(series, strip=True):
+    # Title-case (and strip) each distinct label once, then map back through the factorized codes.
+    codes, uniques = pd.factorize(series)
+    labels = pd.Index(uniques).astype(str).str.title()
+    if strip:
+        labels = labels.str.strip()
+    label_codes, categories = pd.factorize(labels, sort=True)
+    # The trailing -1 keeps NaN rows (code -1) as NaN, even when there are no labels at all.
+    return pd.Series(
+        pd.Categorical.from_codes(np.append(label_codes, -1)[codes], categories=categories),
+        index=series.index
+    )
+
+def clean_reviews(df):
+    df.columns = df.columns.str.strip()
+    df['Sentiment'] = normalize_labels(df['Sentiment'], strip=False)
+    df = df[df['Sentiment'].isin(['Positive', 'Neutral', 'Negative'])].copy()
+    df['Sentiment'] = df['Sentiment'].cat.remove_unused_categories()
+    df['Cleaned_Review'] = df['Cleaned_Review'].astype(str)
+    df['District'] = normalize_labels(df['District'])
+    df['Destination'] = normalize_labels(df['Destination'])
+    df['_destination_lc'] = df['Destination'].str.lower().astype('category')
+    df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce').astype('float32')
+    df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce').astype('float32')
+    df['is_urban'] = df['District'].isin(URBAN_DISTRICTS).astype('uint8')
+    df['Area_Type'] = pd.Categorical.from_codes(df['is_urban'].to_numpy(), categories=['Rural', 'Urban'])
+    return df
+
+@st.cache_resource
 def load_excel_data():
     try:
-        df = pd.read_excel(reviews_xlsx)
+        # The Parquet sidecar holds the cleaned frame; it is stale once the xlsx or this script changes.
+        source_mtime = max(os.path.getmtime(reviews_xlsx), os.path.getmtime(__file__))
+        if os.path.exists(reviews_parquet) and os.path.getmtime(reviews_parquet) > source_mtime:
+            try:
+                return pd.read_parquet(reviews_parquet)
+            except (ImportError, OSError, ValueError):
+                pass  # Missing pyarrow or a corrupt sidecar: rebuild from the xlsx below.
+        read_options = dict(
+            usecols=lambda column: column.strip() in REVIEW_COLUMNS,
+            dtype={'Sentiment': 'category', 'District': 'category', 'Destination': 'category'}
+        )
+        try:
+            df = pd.read_excel(reviews_xlsx, engine='calamine', **read_options)
+        except ImportError:
+            df = pd.read_excel(reviews_xlsx, engine='openpyxl', **read_options)
+        df = clean_reviews(df)
+        try:
+            # Write beside the sidecar and swap it in, so a crash or a racing cold start never leaves it half-written.
+            tmp_parquet = f"{reviews_parquet}.{os.getpid()}.tmp"
+            try:
+                df.to_parquet(tmp_parquet, compression='zstd')
+                os.replace(tmp_parquet, reviews_parquet)
+            finally:
+                if os.path.exists(tmp_parquet):
+                    os.remove(tmp_parquet)
+        except (ImportError, OSError):
+            pass  # No pyarrow or a read-only app directory: keep serving from the xlsx.
     except FileNotFoundError:
         st.error("⚠ Final_Cleaned_Tourist_Reviews.xlsx not found.")
         df = pd.DataFrame()
@@ -35,14 +92,16 @@ def load_excel_data():
 reviews_df = load_excel_data()
 
 # -------------------- Load Activities Data --------------------
+ACTIVITY_COLUMNS = ['Activity Category', 'Activity', 'District']
+
 @st.cache_data
 def load_activities_data():
     try:
-        df = pd.read_csv(activities_csv)
+        df = pd.read_csv(activities_csv, usecols=lambda column: column.strip() in ACTIVITY_COLUMNS)
         df.columns = df.columns.str.strip()
-        df['Activity Category'] = df['Activity Category'].astype(str).str.title().str.strip()
+        df['Activity Category'] = normalize_labels(df['Activity Category'])
         df['Activity'] = df['Activity'].astype(str).str.strip()
-        df['District'] = df['District'].astype(str).str.title().str.strip()
+        df['District'] = normalize_labels(df['District'])
     except FileNotFoundError:
         st.error("⚠ Rural_Activities_Expanded.csv not found.")
         df = pd.DataFrame()
@@ -50,37 +109,191 @@ def load_activities_data():
 
 activities_df = load_activities_data()
 
-# -------------------- Data Cleaning --------------------
-if not reviews_df.empty:
-    reviews_df.columns = reviews_df.columns.str.strip()
-    reviews_df['Cleaned_Review'] = reviews_df['Cleaned_Review'].astype(str)
-    reviews_df['Sentiment'] = reviews_df['Sentiment'].astype(str).str.title()
-    reviews_df['District'] = reviews_df['District'].astype(str).str.title().str.strip()
-    reviews_df['Destination'] = reviews_df['Destination'].astype(str).str.title().str.strip()
-    reviews_df = reviews_df[reviews_df['Sentiment'].isin(['Positive', 'Neutral', 'Negative'])]
-    reviews_df['Latitude'] = pd.to_numeric(reviews_df['Latitude'], errors='coerce')
-    reviews_df['Longitude'] = pd.to_numeric(reviews_df['Longitude'], errors='coerce')
-
-# -------------------- Database Setup --------------------
-conn = sqlite3.connect(os.path.join(BASE_DIR, "tourism.db"))
-cursor = conn.cursor()
-cursor.execute("DROP TABLE IF EXISTS reviews")
-conn.commit()
-
-if not reviews_df.empty:
-    reviews_df.to_sql("reviews", conn, if_exists="replace", index=False)
-
-# -------------------- Navbar --------------------
-pages = ["Home", "Explore", "Itinerary", "About"]
-if "page" not in st.session_state:
-    st.session_state.page = "Home"
-
-cols = st.columns(len(pages))
-for i, page in enumerate(pages):
-    if cols[i].button(page):
-        st.session_state.page = page
-
-st.markdown("""
+# -------------------- Word Clouds --------------------
+# Shared read-only across sessions, so each word cloud miss reads one entry instead of unpickling them all.
+@st.cache_resource(show_spinner=False)
+def load_word_frequencies():
+    # Imported lazily, like reportlab in build_itinerary_pdf, so pages that never draw a cloud skip it.
+    from wordcloud import WordCloud
+
+    # Tokenize each (district, sentiment) group once; "All" is the sum of its districts.
+    processor = WordCloud()
+    freqs = {}
+    for (district, sentiment), reviews in reviews_df.groupby(['District', 'Sentiment'], observed=True)['Cleaned_Review']:
+        district_freqs = processor.process_text(" ".join(reviews.dropna()))
+        freqs[(district, sentiment)] = district_freqs
+        freqs.setdefault(("All", sentiment), Counter()).update(district_freqs)
+    return freqs
+
+@st.cache_data(show_spinner=False)
+def generate_wordcloud(district_choice, sentiment):
+    freqs = load_word_frequencies().get((district_choice, sentiment))
+    if not freqs:
+        return None
+    from wordcloud import WordCloud
+
+    image = WordCloud(width=800, height=300, background_color='white').generate_from_frequencies(freqs).to_image()
+    png_buffer = BytesIO()
+    image.save(png_buffer, format="PNG")
+    return png_buffer.getvalue()
+
+# -------------------- Explore Charts --------------------
+def filter_reviews(district_choice):
+    if district_choice == "All":
+        return reviews_df
+    return reviews_df[reviews_df["District"] == district_choice]
+
+@st.cache_data(show_spinner=False)
+def reviews_stats():
+    return len(reviews_df), reviews_df['Destination'].nunique(), reviews_df['District'].nunique()
+
+@st.cache_data(show_spinner=False)
+def review_counts(district_choice):
+    # One pass over the filtered reviews; the pie, top-rural and urban/rural charts all roll up from it.
+    return filter_reviews(district_choice).groupby(
+        ['Area_Type', 'Sentiment', 'Destination'], observed=True, dropna=False
+    ).size()
+
+@st.cache_data(show_spinner=False)
+def build_area_fig(district_choice):
+    area_counts = (
+        review_counts(district_choice)
+        .groupby(level='Area_Type', observed=True).sum()
+        .sort_values(ascending=False)
+        .reset_index()
+    )
+    area_counts.columns = ['Area Type', 'Review Count']
+    fig_area = px.pie(area_counts, names='Area Type', values='Review Count', hole=0.4,
+                      color_discrete_sequence=px.colors.qualitative.Pastel)
+    fig_area.update_traces(textinfo='percent+label')
+    # Keyed on the filter so zoom, pan and legend toggles survive reruns but reset on a new district.
+    fig_area.update_layout(uirevision=district_choice)
+    return fig_area.to_dict()
+
+@st.cache_data(show_spinner=False)
+def top_positive_rural(district_choice):
+    counts = review_counts(district_choice)
+    rural_positive = ((counts.index.get_level_values('Area_Type') == 'Rural')
+                      & (counts.index.get_level_values('Sentiment') == 'Positive')
+                      & counts.index.get_level_values('Destination').notna())
+    # Most reviews first, ties broken alphabetically so the tenth slot is deterministic.
+    return (counts[rural_positive].droplevel(['Area_Type', 'Sentiment'])
+            .sort_index().sort_values(ascending=False, kind='stable').head(10))
+
+@st.cache_data(show_spinner=False)
+def build_top_rural_fig(district_choice):
+    top_rural_counts = top_positive_rural(district_choice)
+    counts = top_rural_counts.to_numpy()
+    fig_top_rural = go.Figure(go.Bar(
+        x=top_rural_counts.index.to_numpy(dtype=object), y=counts,
+        marker=dict(color=counts, coloraxis='coloraxis'),
+        hovertemplate='Destination=%{x}<br>Positive Review Count=%{y}<extra></extra>'
+    ))
+    fig_top_rural.update_layout(
+        xaxis_title='Destination', yaxis_title='Positive Review Count',
+        coloraxis=dict(colorscale='viridis', colorbar=dict(title='Positive Review Count')),
+        uirevision=district_choice
+    )
+    return fig_top_rural.to_dict()
+
+SENTIMENT_COLORS = {'Positive': 'green', 'Neutral': 'orange', 'Negative': 'red'}
+MAP_POINT_LIMIT = 2000
+
+@st.cache_data(show_spinner=False)
+def build_map_fig(district_choice):
+    map_df = filter_reviews(district_choice).dropna(subset=['Latitude', 'Longitude'])
+    if map_df.empty:
+        return None
+    center = dict(lat=float(map_df['Latitude'].mean()), lon=float(map_df['Longitude'].mean()))
+    aggregated = len(map_df) > MAP_POINT_LIMIT
+    if aggregated:
+        # Too many overlapping points to send one by one: count reviews per district and sentiment on a
+        # 0.02° grid, so a cell shared by two districts becomes one marker for each.
+        map_df = (
+            map_df.assign(Latitude=(map_df['Latitude'] * 50).round() / 50,
+                          Longitude=(map_df['Longitude'] * 50).round() / 50)
+            .groupby(['Latitude', 'Longitude', 'District', 'Sentiment'], observed=True, dropna=False)
+            .agg(Destinations=('Destination', 'nunique'), Reviews=('Cleaned_Review', 'size'))
+            .reset_index()
+        )
+        title_column, detail_columns = 'District', ['Destinations', 'Reviews']
+    else:
+        title_column, detail_columns = 'Destination', ['District', 'Cleaned_Review']
+    hover_details = ''.join(f'<br>{column}=%{{customdata[{i}]}}' for i, column in enumerate(detail_columns))
+    fig_map = go.Figure()
+    for sentiment, color in SENTIMENT_COLORS.items():
+        points = map_df[map_df['Sentiment'] == sentiment]
+        if points.empty:
+            continue
+        marker = dict(color=color)
+        if aggregated:
+            marker['size'] = np.clip(np.sqrt(points['Reviews'].to_numpy()) * 5, 6, 40)
+        fig_map.add_trace(go.Scattermapbox(
+            lat=points['Latitude'].to_numpy(), lon=points['Longitude'].to_numpy(),
+            mode='markers', marker=marker, name=sentiment,
+            hovertext=points[title_column].to_numpy(dtype=object),
+            customdata=points[detail_columns].to_numpy(dtype=object),
+            hovertemplate=('<b>%{hovertext}</b><br><br>Sentiment=' + sentiment
+                           + '<br>Latitude=%{lat}<br>Longitude=%{lon}' + hover_details + '<extra></extra>')
+        ))
+    fig_map.update_layout(
+        mapbox=dict(style="open-street-map", zoom=6, center=center),
+        height=500, margin=dict(t=60), legend_title_text='Sentiment', uirevision=district_choice
+    )
+    return fig_map.to_dict()
+
+@st.cache_data(show_spinner=False)
+def build_urban_rural_fig(district_choice):
+    sentiment_comparison = (
+        review_counts(district_choice)
+        .groupby(level=['Area_Type', 'Sentiment'], observed=True).sum()
+        .rename('Count')
+        .reset_index()
+    )
+    fig_urban_rural = px.bar(
+        sentiment_comparison,
+        x='Sentiment',
+        y='Count',
+        color='Area_Type',
+        barmode='group',
+        text='Count',
+        color_discrete_map={'Urban': 'blue', 'Rural': 'green'},
+        title="Sentiment Comparison: Urban vs Rural Destinations"
+    )
+    fig_urban_rural.update_layout(
+        xaxis_title="Sentiment", yaxis_title="Number of Reviews", legend_title="Area Type", uirevision=district_choice
+    )
+    return fig_urban_rural.to_dict()
+
+# -------------------- Itinerary Matching --------------------
+def match_destinations(itinerary_df, city):
+    if not city:
+        return np.zeros(len(itinerary_df), dtype=bool)
+    city = city.strip().lower()
+    destination_lc = itinerary_df['_destination_lc']
+    # Users usually type a full destination name; only scan for substrings when nothing matches exactly.
+    mask = (destination_lc == city).to_numpy()
+    if not mask.any():
+        mask = destination_lc.str.contains(city, regex=False, na=False).to_numpy()
+    return mask
+
+# -------------------- PDF Export --------------------
+def build_itinerary_pdf(itinerary_text):
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+    styles = getSampleStyleSheet()
+    story = [Paragraph(escape(line), styles['BodyText']) if line.strip() else Spacer(1, 12)
+             for line in itinerary_text.split("\n")]
+    pdf_buffer = BytesIO()
+    SimpleDocTemplate(pdf_buffer, pagesize=letter).build(story)
+    return pdf_buffer.getvalue()
+
+# -------------------- Page Styles --------------------
+HOME_BG_URL = "https://ceylonsrilankan.com/_next/image?url=%2Fimg%2Fdemodara-bridge.jpeg&w=3840&q=75"
+
+APP_CSS = """
 <style>
 .stButton button {
     width: 100%;
@@ -100,32 +313,48 @@ st.markdown("""
 }
 h1,h2,h3,h4,h5,h6 { font-weight: bold !important; }
 .stMarkdown p { font-size: 1rem; }
+.home-overlay {
+    background: rgba(0, 0, 0, 0.4);
+    padding: 150px 20px;
+    border-radius: 10px;
+    text-align: center;
+}
+.home-overlay h1, .home-overlay p {
+    color: white !important;
+    text-shadow: 2px 2px 8px rgba(0,0,0,0.7);
+}
+</style>
+"""
+
+# Only the Home page gets the full-screen photo behind the app.
+HOME_BACKGROUND_CSS = f"""
+<style>
+.stApp {{
+    background-image: url('{HOME_BG_URL}');
+    background-size: cover;
+    background-position: center;
+    background-repeat: no-repeat;
+    background-attachment: fixed;
+}}
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# -------------------- Navbar --------------------
+pages = ["Home", "Explore", "Itinerary", "About"]
+if "page" not in st.session_state:
+    st.session_state.page = "Home"
+
+cols = st.columns(len(pages))
+for i, page in enumerate(pages):
+    if cols[i].button(page):
+        st.session_state.page = page
+
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # -------------------- Home Page --------------------
 if st.session_state.page == "Home":
-    home_bg_url = "https://ceylonsrilankan.com/_next/image?url=%2Fimg%2Fdemodara-bridge.jpeg&w=3840&q=75"
-    st.markdown(f"""
-    <style>
-    .stApp {{
-        background-image: url('{home_bg_url}');
-        background-size: cover;
-        background-position: center;
-        background-repeat: no-repeat;
-        background-attachment: fixed;
-    }}
-    .home-overlay {{
-        background: rgba(0, 0, 0, 0.4);
-        padding: 150px 20px;
-        border-radius: 10px;
-        text-align: center;
-    }}
-    .home-overlay h1, .home-overlay p {{
-        color: white !important;
-        text-shadow: 2px 2px 8px rgba(0,0,0,0.7);
-    }}
-    </style>
+    st.markdown(HOME_BACKGROUND_CSS, unsafe_allow_html=True)
+    st.markdown("""
     <div class="home-overlay">
         <h1 style="font-size:4rem;">🌏 TravelPulse Sri Lanka</h1>
         <p style="font-size:1.5rem;">
@@ -137,98 +366,52 @@ if st.session_state.page == "Home":
 # -------------------- Explore Page --------------------
 elif st.session_state.page == "Explore":
     st.title("🔍 Explore Sentiment Insights")
-    conn = sqlite3.connect(os.path.join(BASE_DIR, "tourism.db"))
-    reviews = pd.read_sql("SELECT * FROM reviews", conn)
-    conn.close()
+    reviews = reviews_df
 
     if not reviews.empty:
         st.sidebar.header("🔎 Filter Reviews")
         district_choice = st.sidebar.selectbox("Choose District", ["All"] + sorted(reviews["District"].dropna().unique()))
-        filtered_df = reviews.copy()
-        if district_choice != "All":
-            filtered_df = reviews[reviews["District"] == district_choice]
-
+        total_reviews, unique_destinations, districts_covered = reviews_stats()
         col1, col2, col3 = st.columns(3)
-        col1.metric("Total Reviews", len(reviews))
-        col2.metric("Unique Destinations", reviews['Destination'].nunique())
-        col3.metric("Districts Covered", reviews['District'].nunique())
+        col1.metric("Total Reviews", total_reviews)
+        col2.metric("Unique Destinations", unique_destinations)
+        col3.metric("Districts Covered", districts_covered)
         st.markdown("---")
 
-        urban_districts = ["Colombo", "Kandy", "Galle", "Jaffna", "Negombo", "Matara", "Kurunegala"]
-        filtered_df['Area_Type'] = filtered_df['District'].apply(lambda x: 'Urban' if x in urban_districts else 'Rural')
-
         # Pie chart
-        area_counts = filtered_df['Area_Type'].value_counts().reset_index()
-        area_counts.columns = ['Area Type', 'Review Count']
-        fig_area = px.pie(area_counts, names='Area Type', values='Review Count', hole=0.4,
-                          color_discrete_sequence=px.colors.qualitative.Pastel)
-        fig_area.update_traces(textinfo='percent+label')
         st.subheader("📊 Review Distribution by Area")
-        st.plotly_chart(fig_area, use_container_width=True)
+        st.plotly_chart(go.Figure(build_area_fig(district_choice)), use_container_width=True)
 
         # Top Positive Rural Destinations
         st.subheader("🌟 Top Positive Rural Destinations")
-        top_rural = filtered_df[(filtered_df['Area_Type'] == 'Rural') & (filtered_df['Sentiment'] == 'Positive')]
-        top_rural_counts = top_rural['Destination'].value_counts().head(10).reset_index()
-        top_rural_counts.columns = ['Destination', 'Positive Review Count']
-        fig_top_rural = px.bar(top_rural_counts, x='Destination', y='Positive Review Count',
-                               color='Positive Review Count', color_continuous_scale='viridis')
-        st.plotly_chart(fig_top_rural, use_container_width=True)
+        st.plotly_chart(go.Figure(build_top_rural_fig(district_choice)), use_container_width=True)
 
         # Word Clouds
         st.subheader("☁ Word Cloud by Sentiment")
-        def generate_wordcloud(sentiment):
-            text = " ".join(filtered_df[filtered_df['Sentiment'] == sentiment]['Cleaned_Review'].dropna())
-            if not text.strip():
-                st.warning(f"No {sentiment} reviews available to generate a word cloud.")
-                return None
-            return WordCloud(width=800, height=300, background_color='white').generate(text)
-
         tabs = st.tabs(['🌟 Positive', '😐 Neutral', '💢 Negative'])
         for i, sentiment in enumerate(['Positive', 'Neutral', 'Negative']):
             with tabs[i]:
-                wc = generate_wordcloud(sentiment)
-                if wc:
-                    fig, ax = plt.subplots(figsize=(10, 4))
-                    ax.imshow(wc, interpolation='bilinear')
-                    ax.axis('off')
-                    st.pyplot(fig)
+                wc = generate_wordcloud(district_choice, sentiment)
+                if wc is not None:
+                    st.image(wc, width="stretch")
+                else:
+                    st.warning(f"No {sentiment} reviews available to generate a word cloud.")
 
         # Map
         st.subheader("🗺 Tourist Review Locations by Sentiment")
-        map_df = filtered_df.dropna(subset=['Latitude', 'Longitude'])
-        if not map_df.empty:
-            fig_map = px.scatter_mapbox(
-                map_df, lat='Latitude', lon='Longitude', color='Sentiment',
-                hover_name='Destination', hover_data={'District': True, 'Cleaned_Review': True},
-                zoom=6, height=500,
-                color_discrete_map={'Positive': 'green', 'Neutral': 'orange', 'Negative': 'red'}
-            )
-            fig_map.update_layout(mapbox_style="open-street-map")
-            st.plotly_chart(fig_map, use_container_width=True)
+        fig_map = build_map_fig(district_choice)
+        if fig_map is not None:
+            st.plotly_chart(go.Figure(fig_map), use_container_width=True)
         else:
             st.warning("⚠ No geolocation data available.")
 
         # Urban vs Rural Sentiment
         st.subheader("📊 Urban vs Rural Sentiment Comparison")
-        sentiment_comparison = filtered_df.groupby(['Area_Type', 'Sentiment']).size().reset_index(name='Count')
-        fig_urban_rural = px.bar(
-            sentiment_comparison,
-            x='Sentiment',
-            y='Count',
-            color='Area_Type',
-            barmode='group',
-            text='Count',
-            color_discrete_map={'Urban': 'blue', 'Rural': 'green'},
-            title="Sentiment Comparison: Urban vs Rural Destinations"
-        )
-        fig_urban_rural.update_layout(xaxis_title="Sentiment", yaxis_title="Number of Reviews", legend_title="Area Type")
-        st.plotly_chart(fig_urban_rural, use_container_width=True)
+        st.plotly_chart(go.Figure(build_urban_rural_fig(district_choice)), use_container_width=True)
 
 # -------------------- Itinerary Page --------------------
 elif st.session_state.page == "Itinerary":
     st.markdown("<h1>🧳 Personalized Travel Itinerary</h1>", unsafe_allow_html=True)
-    pdf_bytes = None
     col1, col2 = st.columns([2, 1])
 
     with col1:
@@ -252,58 +435,50 @@ elif st.session_state.page == "Itinerary":
                 if preferred_activity and "Any" not in preferred_activity:
                     activity_filtered = activities_df[activities_df['Activity Category'].isin(preferred_activity)]
                 else:
-                    activity_filtered = activities_df.copy()
+                    activity_filtered = activities_df
 
+                # One activity per district, so the merge keeps one row per destination.
                 itinerary_df = itinerary_df.merge(
-                    activity_filtered[['District', 'Activity Category', 'Activity']], on='District', how='left'
+                    activity_filtered[['District', 'Activity Category', 'Activity']].drop_duplicates('District'),
+                    on='District', how='left'
                 )
 
-                if start_city:
-                    start_row = itinerary_df[itinerary_df['Destination'].str.contains(start_city, case=False)]
-                    if not start_row.empty:
-                        itinerary_df = pd.concat([start_row, itinerary_df.drop(start_row.index)])
-                if end_city:
-                    end_row = itinerary_df[itinerary_df['Destination'].str.contains(end_city, case=False)]
-                    if not end_row.empty:
-                        itinerary_df = pd.concat([itinerary_df.drop(end_row.index), end_row])
-
-                itinerary_df = itinerary_df.reset_index(drop=True)
+                # Start-city matches lead and end-city matches trail; rows matching both go last.
+                start_mask = match_destinations(itinerary_df, start_city)
+                end_mask = match_destinations(itinerary_df, end_city)
+                order = np.concatenate([
+                    np.flatnonzero(start_mask & ~end_mask),
+                    np.flatnonzero(~start_mask & ~end_mask),
+                    np.flatnonzero(start_mask & end_mask),
+                    np.flatnonzero(end_mask & ~start_mask),
+                ])
+
+                itinerary_df = itinerary_df.iloc[order].reset_index(drop=True)
                 destinations_per_day = max(1, len(itinerary_df) // num_days)
                 st.markdown("### 🗺 Your Travel Itinerary")
                 itinerary_text = ""
 
+                lines = [
+                    f"- **Destination:** {destination} ({district})  \n"
+                    f"  **Sentiment:** {sentiment}  \n"
+                    f"  **Activity:** {f'{category} - {activity}' if pd.notna(category) else 'N/A'}"
+                    for destination, district, sentiment, category, activity in zip(
+                        itinerary_df['Destination'], itinerary_df['District'], itinerary_df['Sentiment'],
+                        itinerary_df['Activity Category'], itinerary_df['Activity']
+                    )
+                ]
+
                 for day in range(num_days):
-                    day_plan = itinerary_df.iloc[day * destinations_per_day:(day + 1) * destinations_per_day]
-                    if not day_plan.empty:
-                        st.markdown(f"<div><h3>📅 Day {day + 1}</h3>", unsafe_allow_html=True)
-                        for _, row in day_plan.iterrows():
-                            activity_info = f"{row['Activity Category']} - {row['Activity']}" if pd.notna(row['Activity Category']) else "N/A"
-                            line = (f"- **Destination:** {row['Destination']} ({row['District']})  \n"
-                                    f"  **Sentiment:** {row['Sentiment']}  \n"
-                                    f"  **Activity:** {activity_info}")
-                            st.markdown(line, unsafe_allow_html=True)
-                            itinerary_text += line + "\n"
-                        st.markdown("</div>", unsafe_allow_html=True)
-                        itinerary_text += "\n"
-
-                # PDF Export
-                pdf_buffer = BytesIO()
-                c = canvas.Canvas(pdf_buffer, pagesize=letter)
-                width, height = letter
-                y = height - 50
-                for line in itinerary_text.split("\n"):
-                    c.drawString(50, y, line)
-                    y -= 15
-                    if y < 50:
-                        c.showPage()
-                        y = height - 50
-                c.save()
-                pdf_bytes = pdf_buffer.getvalue()
-
-            if pdf_bytes:
+                    day_lines = lines[day * destinations_per_day:(day + 1) * destinations_per_day]
+                    if day_lines:
+                        day_text = "\n".join(day_lines)
+                        st.markdown(f"### 📅 Day {day + 1}\n{day_text}", unsafe_allow_html=True)
+                        itinerary_text += day_text + "\n\n"
+
+                # PDF Export (built only when the user clicks download)
                 st.download_button(
                     label="📥 Download Itinerary as PDF",
-                    data=pdf_bytes,
+                    data=lambda: build_itinerary_pdf(itinerary_text),
                     file_name="travel_itinerary.pdf",
                     mime="application/pdf"
                 )